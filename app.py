@@ -1,10 +1,26 @@
-from flask import Flask, render_template, request, jsonify
+from flask import Flask, request, jsonify, Response
+from flask.json.provider import DefaultJSONProvider
 from flask_cors import CORS
 import os
 import base64
+import gzip
+import hashlib
+import threading
+from collections import OrderedDict
 from PIL import Image
 import io
 
+# Optional speed-ups: orjson for JSON encoding, brotli for compression
+try:
+    import orjson
+except ImportError:
+    orjson = None
+
+try:
+    import brotli
+except ImportError:
+    brotli = None
+
 # Load environment variables from .env file (for local development)
 from pathlib import Path
 env_path = Path('.') / '.env'
@@ -28,7 +44,31 @@ from groq import Groq
 # Force CPU mode to reduce memory
 torch.set_num_threads(1)
 
+class FastJSONProvider(DefaultJSONProvider):
+    """Compact JSON responses, encoded with orjson when it is installed"""
+    compact = True
+    sort_keys = False
+    ensure_ascii = False
+
+    def response(self, *args, **kwargs):
+        if orjson is None:
+            return super().response(*args, **kwargs)
+        obj = self._prepare_response_obj(args, kwargs)
+        try:
+            # Hand datetimes and dataclasses to Flask's encoder so the wire
+            # format is the same with or without orjson
+            body = orjson.dumps(
+                obj,
+                default=self.default,
+                option=orjson.OPT_NON_STR_KEYS | orjson.OPT_PASSTHROUGH_DATETIME | orjson.OPT_PASSTHROUGH_DATACLASS
+            )
+        except TypeError:
+            # Types orjson can't handle fall back to the stdlib encoder
+            return super().response(obj)
+        return self._app.response_class(body, mimetype=self.mimetype)
+
 app = Flask(__name__)
+app.json = FastJSONProvider(app)
 CORS(app)
 
 # Load API keys from environment variables (secure for deployment)
@@ -52,6 +92,13 @@ if not ELEVENLABS_API_KEY:
 UPLOAD_FOLDER = 'uploads'
 os.makedirs(UPLOAD_FOLDER, exist_ok=True)
 
+# Response settings
+AUDIO_MODES = ('none', 'url', 'inline')
+DEFAULT_AUDIO_MODE = 'inline'
+AUDIO_CACHE_SIZE = 64
+COMPRESS_MIN_SIZE = 512  # Bytes; smaller bodies aren't worth compressing
+INDEX_PATH = os.path.join(os.path.dirname(os.path.abspath(__file__)), 'templates', 'index.html')
+
 # Load the model (cached for performance)
 MODEL_PATH = "./agri-plant-disease-resnet50"
 print("🌱 Loading plant disease detection model...")
@@ -169,8 +216,8 @@ def predict_disease(image):
 # Conversation context storage (simple in-memory for now)
 conversation_context = {}
 
-def generate_voice_response(text):
-    """Generate voice response using ElevenLabs API"""
+def synthesize_speech(text):
+    """Generate MP3 audio for text using ElevenLabs API"""
     if not ELEVENLABS_API_KEY:
         return None
     
@@ -190,15 +237,112 @@ def generate_voice_response(text):
             }
         }
         
-        response = requests.post(url, json=data, headers=headers)
+        # Other requests for the same audio wait on this call, so never let it hang
+        response = requests.post(url, json=data, headers=headers, timeout=30)
         if response.status_code == 200:
-            audio_base64 = base64.b64encode(response.content).decode('utf-8')
-            return audio_base64
+            return response.content
         return None
     except Exception as e:
         print(f"Error generating voice: {e}")
         return None
 
+# Synthesized audio keyed by a hash of its text, so repeated answers
+# (fallback replies, re-played advice) don't hit ElevenLabs twice
+audio_cache = OrderedDict()
+audio_cache_lock = threading.Lock()
+
+def get_audio_key(text):
+    """Content-addressed key for a voice response"""
+    return hashlib.sha256(text.encode('utf-8')).hexdigest()[:32]
+
+def register_audio(text):
+    """Remember text for deferred synthesis and return its cache key"""
+    key = get_audio_key(text)
+    with audio_cache_lock:
+        if key in audio_cache:
+            audio_cache.move_to_end(key)
+        else:
+            audio_cache[key] = {'text': text, 'audio': None, 'lock': threading.Lock()}
+            while len(audio_cache) > AUDIO_CACHE_SIZE:
+                audio_cache.popitem(last=False)
+    return key
+
+def get_cached_audio(key):
+    """Return MP3 bytes for a registered key, synthesizing on first use"""
+    with audio_cache_lock:
+        entry = audio_cache.get(key)
+        if entry is None:
+            return None
+        audio_cache.move_to_end(key)
+    
+    # Per-entry lock: concurrent fetches of the same key (e.g. a browser's
+    # follow-up Range request) wait for one synthesis instead of paying twice
+    with entry['lock']:
+        if entry['audio'] is None:
+            entry['audio'] = synthesize_speech(entry['text'])
+        return entry['audio']
+
+def generate_voice_response(text, mode=DEFAULT_AUDIO_MODE):
+    """Build the 'audio' field of a response for the requested audio mode"""
+    if mode == 'none' or not ELEVENLABS_API_KEY:
+        return None
+    
+    key = register_audio(text)
+    if mode == 'url':
+        # Synthesis is deferred until the client actually fetches the audio
+        return f"/api/audio/{key}"
+    
+    audio = get_cached_audio(key)
+    if audio is None:
+        return None
+    return base64.b64encode(audio).decode('utf-8')
+
+def get_audio_mode(options):
+    """Read the audio mode from request data, falling back to the query string"""
+    mode = options.get('audio') or request.args.get('audio') or DEFAULT_AUDIO_MODE
+    mode = str(mode).lower()
+    return mode if mode in AUDIO_MODES else None
+
+def negotiate_encoding(available):
+    """Pick the best Content-Encoding the client accepts from those available"""
+    return request.accept_encodings.best_match(available) or 'identity'
+
+def compress_body(data, encoding, static=False):
+    """Compress a response body; static assets get the slower, smaller settings"""
+    if encoding == 'br':
+        return brotli.compress(data, quality=11 if static else 5)
+    if encoding == 'gzip':
+        return gzip.compress(data, compresslevel=9 if static else 6)
+    return data
+
+def supported_encodings():
+    """Content-Encodings this server can produce, in order of preference"""
+    return ['br', 'gzip'] if brotli is not None else ['gzip']
+
+def load_static_page(path):
+    """Read a page once and precompress it for every supported encoding"""
+    mtime = os.stat(path).st_mtime
+    with open(path, 'rb') as f:
+        raw = f.read()
+    
+    etag = hashlib.sha256(raw).hexdigest()[:32]
+    # Compressed variants come first: best_match breaks ties in this order,
+    # so 'Accept-Encoding: *' or 'gzip, identity' get a compressed page
+    variants = {}
+    for encoding in supported_encodings():
+        variants[encoding] = compress_body(raw, encoding, static=True)
+    variants['identity'] = raw
+    return {'etag': etag, 'mtime': mtime, 'variants': variants}
+
+index_page = load_static_page(INDEX_PATH)
+
+def get_index_page():
+    """Return the cached index, rebuilt in debug mode when the file changes"""
+    global index_page
+    if app.debug and os.stat(INDEX_PATH).st_mtime != index_page['mtime']:
+        index_page = load_static_page(INDEX_PATH)
+    return index_page
+
 def get_weather_data(city=None, lat=None, lon=None):
     """Fetch weather data from OpenWeatherMap API"""
     try:
@@ -256,9 +400,57 @@ Consider these weather conditions when providing plant care advice:
 - Strong winds can damage plants
 - Cold temperatures may stress plants"""
 
+@app.after_request
+def compress_api_response(response):
+    """Gzip/brotli-encode JSON API responses when the client accepts it"""
+    if (not request.path.startswith('/api/')
+            or response.mimetype != 'application/json'
+            or response.direct_passthrough
+            or 'Content-Encoding' in response.headers):
+        return response
+    
+    response.vary.add('Accept-Encoding')
+    data = response.get_data()
+    if len(data) < COMPRESS_MIN_SIZE:
+        return response
+    
+    encoding = negotiate_encoding(supported_encodings())
+    if encoding == 'identity':
+        return response
+    
+    response.set_data(compress_body(data, encoding))
+    response.headers['Content-Encoding'] = encoding
+    return response
+
 @app.route('/')
 def index():
-    return render_template('index.html')
+    """Serve the precompressed chat page with ETag revalidation"""
+    page = get_index_page()
+    encoding = negotiate_encoding(list(page['variants']))
+    response = Response(page['variants'][encoding], mimetype='text/html')
+    if encoding != 'identity':
+        response.headers['Content-Encoding'] = encoding
+    response.vary.add('Accept-Encoding')
+    # The page lives at a fixed URL, so browsers must revalidate; the ETag
+    # turns every repeat visit into an empty 304
+    response.headers['Cache-Control'] = 'public, no-cache'
+    response.set_etag(f"{page['etag']}-{encoding}")
+    return response.make_conditional(request)
+
+@app.route('/api/audio/<key>')
+def get_audio(key):
+    """Serve a voice response handed out with audio=url"""
+    audio = get_cached_audio(key)
+    if audio is None:
+        return jsonify({'error': 'Audio not found or voice generation unavailable'}), 404
+    
+    response = Response(audio, mimetype='audio/mpeg')
+    # Keys are hashes of the spoken text, so the content never changes
+    response.headers['Cache-Control'] = 'private, max-age=31536000, immutable'
+    response.set_etag(key)
+    # Safari only plays media served with byte-range (206) support
+    response.headers['Accept-Ranges'] = 'bytes'
+    return response.make_conditional(request, accept_ranges=True, complete_length=len(audio))
 
 @app.route('/api/detect', methods=['POST'])
 def detect_disease():
@@ -266,6 +458,10 @@ def detect_disease():
         # Get session ID for context tracking
         session_id = request.form.get('session_id', 'default')
         
+        audio_mode = get_audio_mode(request.form)
+        if audio_mode is None:
+            return jsonify({'error': f"Invalid audio option. Use one of: {', '.join(AUDIO_MODES)}"}), 400
+        
         # Get image from request
         if 'image' not in request.files:
             return jsonify({'error': 'No image provided'}), 400
@@ -322,7 +518,7 @@ def detect_disease():
             response_text = f"Detection complete. I've identified {display_name} with {confidence:.1f}% confidence. {treatment['treatment']}"
         
         # Generate voice response
-        audio_data = generate_voice_response(response_text)
+        audio_data = generate_voice_response(response_text, audio_mode)
         
         # Store context for follow-up questions
         conversation_context[session_id] = {
@@ -361,6 +557,10 @@ def chat():
         if not user_message:
             return jsonify({'error': 'Empty message'}), 400
         
+        audio_mode = get_audio_mode(data)
+        if audio_mode is None:
+            return jsonify({'error': f"Invalid audio option. Use one of: {', '.join(AUDIO_MODES)}"}), 400
+        
         # Get weather data for context
         weather_data = None
         if location:
@@ -445,7 +645,7 @@ Be specific and reference the detection results when relevant."""
             response = get_fallback_response(user_message.lower())
         
         # Generate voice for response
-        audio_data = generate_voice_response(response)
+        audio_data = generate_voice_response(response, audio_mode)
         
         return jsonify({
             'response': response,